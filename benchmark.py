@@ -0,0 +1,455 @@
+import argparse
+import io
+import _thread
+import json
+import os
+import random
+import re
+import string
+import tempfile
+import threading
+import time
+import types
+import urllib.parse
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import voice_changer
+from voice_changer import LoanwordMatcher, load_gairaigo_dict, replace_english_words_with_japanese, segment_wav
+
+GAIRAIGO_FILE = "gairaigo.txt"
+NULL_MIC_INDEX = 2  # Device index of the null microphone that replays the utterances
+NULL_MIC_RATE = 16000
+UTTERANCE_GAP = 1.0  # Seconds of room noise before each replayed utterance
+TRAILING_SILENCE = 1.5  # Room noise after the last utterance, so the VAD can cut it before the run stops
+
+# Lines spoken by the generated utterances when no WAV directory is given
+SAMPLE_LINES = (
+    "こんにちは、今日もよろしくお願いします。",
+    "このゲームのボスはかなり強いですね。",
+    "ちょっと待ってください、すぐ戻ります。",
+    "ありがとうございます！",
+    "次のワールドに移動しましょうか？",
+    "マイクの音量は大丈夫ですか？",
+)
+
+def make_synthetic_dictionary(entry_count, seed=0):
+    """Build a loanword dictionary of random English words mapped to katakana."""
+    rng = random.Random(seed)
+    katakana = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモラリルレロ"
+    entries = {}
+    while len(entries) < entry_count:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 12)))
+        entries[word] = "".join(rng.choice(katakana) for _ in range(rng.randint(2, 8)))
+    return entries
+
+def make_sample_text(entries, sentence_count, seed=0):
+    """Build Japanese sentences that mix in dictionary words, unknown words and mixed-script entries."""
+    rng = random.Random(seed)
+    words = list(entries)
+    sentences = []
+    for _ in range(sentence_count):
+        sentences.append(f"今日は{rng.choice(words)}と{rng.choice(words).upper()}を使って unknown{rng.randint(0, 99)} のQRコードを読んだ。")
+    return "".join(sentences)
+
+def legacy_replace(text, entries):
+    """The previous per-token regex replacement, kept here as the baseline."""
+    pattern = re.compile(r'\b([a-zA-Z0-9\-]+)\b')
+    modified_text = pattern.sub(lambda match: entries.get(match.group(0).lower(), match.group(0)), text)
+    return re.sub(r'\s+(?=[ぁ-んァ-ン一-龯])|(?<=[ぁ-んァ-ン一-龯])\s+', '', modified_text)
+
+def count_replaced(text, replaced_text):
+    """Number of English tokens that a replacement turned into katakana."""
+    token = re.compile(r'[a-zA-Z0-9\-]+')
+    return len(token.findall(text)) - len(token.findall(replaced_text))
+
+def time_call(function, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - started) / repeats
+
+def benchmark_gairaigo(entry_count, sentence_count, repeats):
+    """Compare compile time and throughput of the dictionary matcher against the per-token regex."""
+    entries = make_synthetic_dictionary(entry_count)
+    bundled = load_gairaigo_dict(GAIRAIGO_FILE)
+    text = make_sample_text(entries, sentence_count)
+    legacy_entries = {word.lower(): japanese for word, japanese in entries.items()}
+
+    started = time.perf_counter()
+    matcher = LoanwordMatcher(entries)
+    compile_seconds = time.perf_counter() - started
+
+    matcher_seconds = time_call(lambda: replace_english_words_with_japanese(text, matcher), repeats)
+    legacy_seconds = time_call(lambda: legacy_replace(text, legacy_entries), repeats)
+
+    print(f"外来語辞書: {len(matcher)}語 (同梱 {len(bundled)}語), テキスト {len(text)}文字")
+    print(f"辞書の構築: {compile_seconds * 1000:.1f} ms")
+    # The old \b pattern doesn't see a word directly next to kana, so it also replaces far fewer words
+    replaced = count_replaced(text, replace_english_words_with_japanese(text, matcher))
+    legacy_replaced = count_replaced(text, legacy_replace(text, legacy_entries))
+    print(f"辞書置換: {matcher_seconds * 1000:.2f} ms/回, {len(text) / matcher_seconds / 1e6:.2f} M文字/秒, "
+          f"置換 {replaced}語")
+    print(f"従来の正規表現置換: {legacy_seconds * 1000:.2f} ms/回, {len(text) / legacy_seconds / 1e6:.2f} M文字/秒, "
+          f"置換 {legacy_replaced}語")
+
+def benchmark_vad(wav_paths):
+    """Print the utterances the VAD finds in recorded WAV fixtures and how fast it runs."""
+    for wav_path in wav_paths:
+        with wave.open(wav_path, 'rb') as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        started = time.perf_counter()
+        utterances = segment_wav(wav_path)
+        elapsed = time.perf_counter() - started
+        print(f"{wav_path}: {len(utterances)}発話, 処理 {elapsed * 1000:.1f} ms（実時間の{duration / elapsed:.0f}倍速）")
+        for start, end, _ in utterances:
+            print(f"  {start:7.2f} - {end:7.2f} 秒")
+
+def make_tone_wav(duration, rate=24000, channels=1, frequency=220.0):
+    """Return WAV bytes of a quiet sine tone, standing in for synthesized or spoken audio."""
+    np = voice_changer.np
+    tone = (3000 * np.sin(2 * np.pi * frequency * np.arange(int(duration * rate)) / rate)).astype(np.int16)
+    samples = np.repeat(tone[:, None], channels, axis=1).tobytes()
+    wav_bytes = io.BytesIO()
+    with wave.open(wav_bytes, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples)
+    return wav_bytes.getvalue()
+
+class MockEngineHandler(BaseHTTPRequestHandler):
+    """VoiceVox engine stand-in: /audio_query, /synthesis, /speakers, /version and speaker initialization.
+
+    A style's first synthesis (or its /initialize_speaker) also pays model_load_latency.
+    """
+    query_latency = 0.05
+    synthesis_latency = 0.2
+    model_load_latency = 0.0
+    seconds_per_char = 0.08
+    initialized_speakers = set()
+
+    def load_speaker(self, speaker):
+        if speaker not in self.initialized_speakers:
+            time.sleep(self.model_load_latency)
+            self.initialized_speakers.add(speaker)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/speakers":
+            with open(voice_changer.SPEAKERS_FILE, 'rb') as f:
+                self.send_body(f.read(), "application/json")
+        elif path == "/version":
+            self.send_body(b'"mock"', "application/json")
+        elif path == "/is_initialized_speaker":
+            speaker = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)["speaker"][0]
+            self.send_body(json.dumps(speaker in self.initialized_speakers).encode("utf-8"), "application/json")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path == "/audio_query":
+            time.sleep(self.query_latency)
+            audio_query = {"accent_phrases": [], "speedScale": 1.0, "pitchScale": 0.0, "intonationScale": 1.0,
+                           "volumeScale": 1.0, "prePhonemeLength": 0.1, "postPhonemeLength": 0.1,
+                           "outputSamplingRate": 24000, "outputStereo": False, "kana": params["text"][0]}
+            self.send_body(json.dumps(audio_query, ensure_ascii=False).encode("utf-8"), "application/json")
+        elif url.path == "/initialize_speaker":
+            self.load_speaker(params["speaker"][0])
+            self.send_response(204)
+            self.end_headers()
+        elif url.path == "/synthesis":
+            audio_query = json.loads(body)
+            self.load_speaker(params["speaker"][0])
+            time.sleep(self.synthesis_latency)
+            duration = len(audio_query["kana"]) * self.seconds_per_char / audio_query["speedScale"]
+            channels = 2 if audio_query["outputStereo"] else 1
+            self.send_body(make_tone_wav(duration, audio_query["outputSamplingRate"], channels), "audio/wav")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_engine(query_latency, synthesis_latency, model_load_latency=0.0):
+    """Serve the mock engine on a free local port and return the server."""
+    handler = type("ConfiguredMockEngineHandler", (MockEngineHandler,),
+                   {"query_latency": query_latency, "synthesis_latency": synthesis_latency,
+                    "model_load_latency": model_load_latency, "initialized_speakers": set()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="mock-engine", daemon=True).start()
+    return server
+
+class NullStream:
+    """Output stream that pulls audio from the callback at the device rate and throws it away."""
+
+    def __init__(self, rate, frames_per_buffer, stream_callback, speed):
+        self.interval = frames_per_buffer / rate / speed
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = stream_callback
+        self.active = True
+        threading.Thread(target=self.run, name="null-stream", daemon=True).start()
+
+    def run(self):
+        next_buffer = time.monotonic()
+        while self.active:
+            self.callback(None, self.frames_per_buffer, {}, 0)
+            next_buffer += self.interval
+            time.sleep(max(0.0, next_buffer - time.monotonic()))
+
+    def is_active(self):
+        return self.active
+
+    def stop_stream(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+class NullInputStream:
+    """Input stream that hands the replayed PCM to the callback in real time, then room noise.
+
+    on_finished is called once, after the whole recording has been delivered.
+    """
+
+    def __init__(self, rate, frames_per_buffer, stream_callback, pcm, on_finished):
+        self.interval = frames_per_buffer / rate
+        self.chunk_bytes = frames_per_buffer * 2
+        self.callback = stream_callback
+        self.pcm = pcm
+        self.on_finished = on_finished
+        self.noise = make_room_noise(frames_per_buffer)
+        self.active = True
+        threading.Thread(target=self.run, name="null-microphone", daemon=True).start()
+
+    def run(self):
+        next_buffer = time.monotonic()
+        position = 0
+        while self.active:
+            if position < len(self.pcm):
+                chunk = self.pcm[position:position + self.chunk_bytes]
+                chunk += self.noise[len(chunk):]
+                position += self.chunk_bytes
+                if position >= len(self.pcm) and self.on_finished is not None:
+                    threading.Timer(self.interval, self.on_finished).start()
+            else:
+                chunk = self.noise
+            self.callback(chunk, self.chunk_bytes // 2, {}, 0)
+            next_buffer += self.interval
+            time.sleep(max(0.0, next_buffer - time.monotonic()))
+
+    def is_active(self):
+        return self.active
+
+    def stop_stream(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+class NullPyAudio:
+    """PyAudio-compatible host with two null outputs and a null microphone that replays input_pcm."""
+    speed = 1.0
+    input_pcm = b""  # 16-bit mono PCM at NULL_MIC_RATE, replayed once per opened input stream
+    on_input_finished = None
+
+    def get_device_count(self):
+        return 3
+
+    def get_device_info_by_index(self, index):
+        if index == NULL_MIC_INDEX:
+            return {"index": index, "name": "null microphone", "hostApi": 0, "maxInputChannels": 1,
+                    "maxOutputChannels": 0, "defaultSampleRate": float(NULL_MIC_RATE)}
+        return {"index": index, "name": f"null output {index}", "hostApi": 0, "maxInputChannels": 0,
+                "maxOutputChannels": 2, "defaultSampleRate": 48000.0}
+
+    def get_host_api_info_by_index(self, index):
+        return {"index": index, "name": "null"}
+
+    def get_default_input_device_info(self):
+        return self.get_device_info_by_index(NULL_MIC_INDEX)
+
+    def get_default_output_device_info(self):
+        return self.get_device_info_by_index(0)
+
+    def is_format_supported(self, rate, **kwargs):
+        return True
+
+    def open(self, rate, frames_per_buffer, stream_callback, input=False, **kwargs):
+        if input:
+            return NullInputStream(rate, frames_per_buffer, stream_callback, self.input_pcm, self.on_input_finished)
+        return NullStream(rate, frames_per_buffer, stream_callback, self.speed)
+
+    def terminate(self):
+        pass
+
+def make_room_noise(frames, seed=0):
+    """Quiet deterministic noise, so the VAD has a noise floor to track between utterances."""
+    np = voice_changer.np
+    return (np.random.default_rng(seed).normal(0, 30, frames)).astype(np.int16).tobytes()
+
+class ReplayRecognitionBackend:
+    """Recognition backend that returns the transcript of a replayed WAV after a fixed delay.
+
+    The VAD cuts its own utterance boundaries, so a replayed WAV is recognized by a short
+    fingerprint from its middle, which the captured audio contains byte for byte.
+    """
+    name = "replay"
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.transcripts = {}  # fingerprint -> transcript
+
+    def add(self, pcm, transcript):
+        middle = len(pcm) // 4 * 2
+        self.transcripts[pcm[middle:middle + 400]] = transcript
+
+    def recognize(self, recognizer, audio, language):
+        time.sleep(self.latency)
+        # Utterances merged under backpressure are recognized as their transcripts joined together
+        found = sorted((audio.frame_data.find(fingerprint), transcript)
+                       for fingerprint, transcript in self.transcripts.items() if fingerprint in audio.frame_data)
+        if not found:
+            raise voice_changer.sr.UnknownValueError()
+        return "".join(transcript for _, transcript in found)
+
+def load_utterances(folder):
+    """Return (audio, transcript, duration) for the WAVs in a folder, or generated ones without a folder.
+
+    A transcript is read from the .txt file next to each WAV; otherwise a sample line is used.
+    """
+    utterances = []
+    if folder is None:
+        for i, line in enumerate(SAMPLE_LINES):
+            duration = len(line) * 0.12
+            wav_bytes = make_tone_wav(duration, rate=16000, frequency=150.0 + 40 * i)
+            utterances.append((voice_changer.decode_wav(io.BytesIO(wav_bytes)), line, duration))
+    else:
+        wav_names = sorted(name for name in os.listdir(folder) if name.lower().endswith(".wav"))
+        for i, name in enumerate(wav_names):
+            sound = voice_changer.decode_wav(os.path.join(folder, name))
+            transcript_path = os.path.join(folder, os.path.splitext(name)[0] + ".txt")
+            if os.path.exists(transcript_path):
+                with open(transcript_path, 'r', encoding='utf-8') as f:
+                    transcript = f.read().strip()
+            else:
+                transcript = SAMPLE_LINES[i % len(SAMPLE_LINES)]
+            utterances.append((sound, transcript, sound["params"].nframes / sound["params"].framerate))
+    return utterances
+
+def make_input_pcm(utterances, backend, burst):
+    """Lay the utterances out on one 16 kHz mono recording, separated by room noise, for the null microphone."""
+    np = voice_changer.np
+    # Back to back, the gap is only just longer than the VAD hangover
+    gap = (voice_changer.VAD_HANGOVER_MS / 1000 + 0.1) if burst else UTTERANCE_GAP
+    pieces = []
+    for sound, transcript, _ in utterances:
+        pcm = (voice_changer.convert_sound(sound, NULL_MIC_RATE, 1)[:, 0] * 32767).astype(np.int16).tobytes()
+        backend.add(pcm, transcript)
+        pieces.append(make_room_noise(int(gap * NULL_MIC_RATE), seed=len(pieces)))
+        pieces.append(pcm)
+    pieces.append(make_room_noise(int(TRAILING_SILENCE * NULL_MIC_RATE), seed=len(pieces)))
+    return b"".join(pieces)
+
+def run_pipeline_pass(label, utterances, backend, cache_folder, burst):
+    """Replay the utterances on the null microphone through the real capture loop and report latency."""
+    # Fresh scheduler and trace log per pass; the cache folder persists so the second pass is warm
+    voice_changer.playback_scheduler = voice_changer.PlaybackScheduler()
+    log_file = os.path.join(cache_folder, f"latency_{label}.jsonl")
+    voice_changer.tracer = voice_changer.LatencyTracer(log_file)
+    NullPyAudio.input_pcm = make_input_pcm(utterances, backend, burst)
+    # Stops the capture loop the way Ctrl+C does, which drains the pipeline and prints its stats
+    NullPyAudio.on_input_finished = _thread.interrupt_main
+
+    print(f"\n=== {label} ===")
+    started = time.perf_counter()
+    voice_changer.recognize_speech_from_mic(NULL_MIC_INDEX, 0, 1)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(utterances)}発話を{elapsed:.2f}秒で処理（{len(utterances) / elapsed:.2f} 発話/秒、入力の長さを含む）")
+    voice_changer.print_latency_report(log_file)
+
+def benchmark_pipeline(folder, query_latency_ms, synthesis_latency_ms, recognition_latency_ms, playback_speed, burst,
+                       engine_count=1, engine_concurrency=2, model_load_latency_ms=0):
+    """Run the real pipeline offline against mock engines and null devices, cold cache then warm cache."""
+    servers = [start_mock_engine(query_latency_ms / 1000, synthesis_latency_ms / 1000, model_load_latency_ms / 1000)
+               for _ in range(engine_count)]
+    engine_urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+    NullPyAudio.speed = playback_speed
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        # Point the app at the mock engine, null devices, a null clipboard and an empty cache folder
+        voice_changer.pyaudio.module = types.SimpleNamespace(PyAudio=NullPyAudio, paInt16=8, paContinue=0)
+        voice_changer.pyperclip.module = types.SimpleNamespace(copy=lambda text: None)
+        voice_changer.engine_client = voice_changer.EnginePool(
+            [{"url": url, "max_concurrency": engine_concurrency} for url in engine_urls])
+        voice_changer.AUDIO_FOLDER = cache_folder
+        voice_changer.audio_cache = voice_changer.AudioCache(
+            cache_folder, index_file=os.path.join(cache_folder, "cache_index.json"))
+        voice_changer.audio_query_cache = voice_changer.AudioQueryCache(os.path.join(cache_folder, "query_cache.json"))
+        voice_changer.pcm_cache = voice_changer.PcmCache()
+        voice_changer.usage_history = voice_changer.UsageHistory(os.path.join(cache_folder, "usage_history.json"))
+        voice_changer.device_formats.clear()
+        voice_changer.synthesis_output_format = voice_changer.get_device_format(0)
+        voice_changer.english_to_japanese = voice_changer.load_gairaigo_dict(GAIRAIGO_FILE)
+        voice_changer.preload_notification_sounds()
+
+        backend = ReplayRecognitionBackend(recognition_latency_ms / 1000)
+        voice_changer.recognition_backends[backend.name] = backend
+        voice_changer.recognition_latencies[backend.name] = []
+        voice_changer.RECOGNITION_BACKENDS = {"ja-JP": [backend.name], "en-US": [backend.name]}
+
+        utterances = load_utterances(folder)
+        print(f"モックエンジン {len(engine_urls)}台: audio_query {query_latency_ms} ms, synthesis {synthesis_latency_ms} ms, "
+              f"認識 {recognition_latency_ms} ms, 再生速度 {playback_speed}倍")
+        run_pipeline_pass("cold", utterances, backend, cache_folder, burst)
+        run_pipeline_pass("warm", utterances, backend, cache_folder, burst)
+        voice_changer.close_audio_host()
+    for server in servers:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ボイスチェンジャーのベンチマーク")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gairaigo_parser = subparsers.add_parser("gairaigo", help="外来語置換のマイクロベンチマーク")
+    gairaigo_parser.add_argument("--entries", type=int, default=10000, help="合成辞書の語数")
+    gairaigo_parser.add_argument("--sentences", type=int, default=1000, help="テキストの文数")
+    gairaigo_parser.add_argument("--repeats", type=int, default=20, help="計測の繰り返し回数")
+
+    vad_parser = subparsers.add_parser("vad", help="録音済みWAVで音声区間検出を確認")
+    vad_parser.add_argument("wav_paths", nargs="+", help="16ビットモノラルのWAVファイル")
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="モックエンジンとヌルデバイスで認識から再生までを計測")
+    pipeline_parser.add_argument("--utterances", metavar="DIR",
+                                 help="ヌルマイクで実時間再生するWAVのフォルダ（同名の.txtを認識結果に使用）")
+    pipeline_parser.add_argument("--query-latency", type=float, default=50, help="audio_queryの遅延（ms）")
+    pipeline_parser.add_argument("--synthesis-latency", type=float, default=200, help="synthesisの遅延（ms）")
+    pipeline_parser.add_argument("--recognition-latency", type=float, default=300, help="音声認識の遅延（ms）")
+    pipeline_parser.add_argument("--playback-speed", type=float, default=1.0, help="ヌルデバイスの再生速度（倍）")
+    pipeline_parser.add_argument("--model-load-latency", type=float, default=0,
+                                 help="スタイルの初回合成（または初期化）にかかるモデル読み込み時間（ms）")
+    pipeline_parser.add_argument("--engines", type=int, default=1, help="起動するモックエンジンの台数")
+    pipeline_parser.add_argument("--engine-concurrency", type=int, default=2, help="エンジンごとの同時リクエスト数")
+    pipeline_parser.add_argument("--burst", action="store_true",
+                                 help="発話の間を空けずに次々と話す（バックプレッシャーの確認用）")
+
+    args = parser.parse_args()
+    if args.command == "gairaigo":
+        benchmark_gairaigo(args.entries, args.sentences, args.repeats)
+    elif args.command == "vad":
+        benchmark_vad(args.wav_paths)
+    elif args.command == "pipeline":
+        benchmark_pipeline(args.utterances, args.query_latency, args.synthesis_latency, args.recognition_latency,
+                           args.playback_speed, args.burst, args.engines, args.engine_concurrency,
+                           args.model_load_latency)
@@ -44,11 +44,13 @@ def show_device_selector():
         voice_speaker_name = voice_speaker_combobox.get()
         notification_speaker_name = notification_speaker_combobox.get()
 
-        settings = {
+        # Keep optional keys (gains, extra speakers) that this window doesn't edit
+        settings = load_settings()
+        settings.update({
             "mic_keyword": mic_name,
             "voice_speaker_keyword": voice_speaker_name,
             "notification_speaker_keyword": notification_speaker_name
-        }
+        })
 
         save_settings(settings)
         messagebox.showinfo("成功", "デバイスの設定が保存されました。")
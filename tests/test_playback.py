@@ -0,0 +1,57 @@
+"""Tests for the playback scheduler's staleness policy."""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voice_changer import PlaybackScheduler
+
+
+def clip(utterance_id, path, captured_at):
+    return {"utterance_id": utterance_id, "path": path, "devices": (0,), "captured_at": captured_at}
+
+
+class DropIfOlderTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = PlaybackScheduler(policy="drop-if-older", max_age_ms=1000)
+
+    def paths(self):
+        self.scheduler.stop()
+        clips = []
+        while True:
+            next_clip = self.scheduler.next_clip()
+            if next_clip is None:
+                return clips
+            clips.append(next_clip["path"])
+
+    def test_a_started_line_is_played_to_the_end(self):
+        now = time.monotonic()
+        self.scheduler.submit(clip(1, "a.wav", now - 0.5))
+        self.assertEqual(self.scheduler.next_clip()["path"], "a.wav")
+        # The rest of the line comes up after the line has aged past the limit
+        self.scheduler.submit(clip(1, "b.wav", now - 5))
+        self.scheduler.submit(clip(1, None, now - 5))
+        self.assertEqual(self.paths(), ["b.wav", None])
+
+    def test_a_stale_line_is_dropped_whole(self):
+        old = time.monotonic() - 5
+        for path in ["a.wav", "b.wav", None]:
+            self.scheduler.submit(clip(1, path, old))
+        self.scheduler.submit(clip(2, "c.wav", time.monotonic()))
+        self.assertEqual(self.paths(), ["c.wav"])
+
+    def test_chunks_of_a_stale_line_synthesized_later_are_rejected(self):
+        self.scheduler.submit(clip(1, "a.wav", time.monotonic() - 5))
+        self.scheduler.submit(clip(2, "c.wav", time.monotonic()))
+        self.assertEqual(self.scheduler.next_clip()["path"], "c.wav")
+        self.assertTrue(self.scheduler.is_cut(1))
+        self.scheduler.submit(clip(1, "b.wav", time.monotonic() - 5))
+        self.scheduler.submit(clip(1, None, time.monotonic() - 5))
+        self.assertFalse(self.scheduler.is_cut(1))
+        self.assertEqual(self.paths(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
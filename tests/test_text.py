@@ -0,0 +1,69 @@
+"""Tests for the text helpers that prepare recognized speech for synthesis."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voice_changer
+from voice_changer import LoanwordMatcher, split_text_into_chunks
+
+
+class LoanwordMatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = LoanwordMatcher({
+            "PC": "ピーシー",
+            "QR": "キューアール",
+            "QRコード": "キューアールコード",
+            "Windows": "ウィンドウズ",
+            "Windows11": "ウィンドウズイレブン",
+            "e-mail": "イーメール",
+        })
+
+    def test_replaces_words_next_to_japanese(self):
+        self.assertEqual(self.matcher.replace("PCを買った"), "ピーシーを買った")
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.matcher.replace("pcとWINDOWS"), "ピーシーとウィンドウズ")
+
+    def test_longest_match_wins(self):
+        self.assertEqual(self.matcher.replace("Windows11を入れた"), "ウィンドウズイレブンを入れた")
+        self.assertEqual(self.matcher.replace("QRコードを読む"), "キューアールコードを読む")
+        self.assertEqual(self.matcher.replace("QRを読む"), "キューアールを読む")
+
+    def test_does_not_match_inside_a_word(self):
+        self.assertEqual(self.matcher.replace("PCsを買った"), "PCsを買った")
+        self.assertEqual(self.matcher.replace("xPC"), "xPC")
+
+    def test_hyphenated_words(self):
+        self.assertEqual(self.matcher.replace("e-mailを送る"), "イーメールを送る")
+
+    def test_empty_dictionary(self):
+        self.assertEqual(LoanwordMatcher({}).replace("PC"), "PC")
+
+    def test_spaces_around_replacements_are_removed(self):
+        text = voice_changer.replace_english_words_with_japanese("今日 PC を 買った", {"PC": "ピーシー"})
+        self.assertEqual(text, "今日ピーシーを買った")
+
+
+class SplitTextIntoChunksTest(unittest.TestCase):
+    def test_splits_at_sentence_ends(self):
+        self.assertEqual(split_text_into_chunks("こんにちは。元気ですか？"), ["こんにちは。", "元気ですか？"])
+
+    def test_short_chunks_are_joined_with_the_next(self):
+        self.assertEqual(split_text_into_chunks("あ、い、うえおかきくけこ。"), ["あ、い、", "うえおかきくけこ。"])
+
+    def test_short_tail_is_joined_with_the_last_chunk(self):
+        self.assertEqual(split_text_into_chunks("長い文章です！短い。"), ["長い文章です！短い。"])
+
+    def test_text_without_boundaries(self):
+        self.assertEqual(split_text_into_chunks("終わり"), ["終わり"])
+        self.assertEqual(split_text_into_chunks(""), [])
+
+    def test_chunks_keep_the_whole_text(self):
+        text = "今日はいい天気ですね、散歩に行きましょう！でも、雨が降るかも…"
+        self.assertEqual("".join(split_text_into_chunks(text)), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Offline tests for the voice activity detector, run against a WAV fixture generated on the fly."""
+import os
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import voice_changer
+
+RATE = 16000
+FRAME = voice_changer.VAD_FRAME_MS / 1000
+PREROLL = voice_changer.VAD_PREROLL_MS / 1000
+
+
+def write_fixture(path, sections, seed=0):
+    """Write a mono 16-bit WAV of (kind, seconds) sections: "noise" is room noise, "tone" a voiced stand-in."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for kind, seconds in sections:
+        frames = int(seconds * RATE)
+        part = rng.normal(0, 30, frames)
+        if kind == "tone":
+            part += 3000 * np.sin(2 * np.pi * 220 * np.arange(frames) / RATE)
+        parts.append(part)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(np.concatenate(parts).astype(np.int16).tobytes())
+
+
+class SegmentWavTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def segment(self, sections, **vad_options):
+        path = os.path.join(self.directory.name, "fixture.wav")
+        write_fixture(path, sections)
+        return voice_changer.segment_wav(path, **vad_options)
+
+    def test_utterance_boundaries(self):
+        utterances = self.segment([("noise", 1.0), ("tone", 0.6), ("noise", 1.0),
+                                   ("tone", 0.5), ("noise", 1.0)])
+        self.assertEqual(len(utterances), 2)
+        # Each utterance starts one pre-roll before the speech and ends within a frame after it
+        for (start, end, pcm), (onset, offset) in zip(utterances, [(1.0, 1.6), (2.6, 3.1)]):
+            self.assertAlmostEqual(start, onset - PREROLL, delta=FRAME)
+            self.assertAlmostEqual(end, offset, delta=FRAME * 1.5)
+            self.assertEqual(len(pcm), round((end - start) * RATE) * 2)
+
+    def test_short_bursts_are_ignored(self):
+        utterances = self.segment([("noise", 1.0), ("tone", 0.05), ("noise", 1.0)])
+        self.assertEqual(utterances, [])
+
+    def test_noise_only(self):
+        self.assertEqual(self.segment([("noise", 2.0)]), [])
+
+    def test_long_speech_is_split(self):
+        utterances = self.segment([("noise", 1.0), ("tone", 3.0), ("noise", 1.0)], max_utterance_s=1.0)
+        self.assertGreater(len(utterances), 1)
+        for start, end, pcm in utterances:
+            self.assertLessEqual(end - start, 1.0 + PREROLL + FRAME)
+
+    def test_stereo_is_rejected(self):
+        path = os.path.join(self.directory.name, "stereo.wav")
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(2)
+            wf.setsampwidth(2)
+            wf.setframerate(RATE)
+            wf.writeframes(b"\0" * 400)
+        with self.assertRaises(ValueError):
+            voice_changer.segment_wav(path)
+
+
+if __name__ == "__main__":
+    unittest.main()